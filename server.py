@@ -7,25 +7,36 @@ Provides tools for managing expenses, receipts, and accounting data.
 """
 
 import os
+import re
+import asyncio
+import functools
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 import logging
-from typing import Optional, List, Dict, Any
+from contextlib import asynccontextmanager
+from typing import Optional, List, Dict, Any, Annotated, BinaryIO, Literal, Tuple
 from datetime import datetime
 
 import httpx
+import orjson
+from cachetools import TTLCache
 from fastmcp import FastMCP
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, BeforeValidator, ConfigDict, Field, TypeAdapter
+from tenacity import (
+    RetryCallState,
+    before_sleep_log,
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential_jitter
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize FastMCP server
-mcp = FastMCP("pleo-mcp")
-
 # Pleo API configuration
 PLEO_API_BASE_URL = "https://openapi.pleo.io/v1"
 PLEO_API_KEY = os.getenv("PLEO_API_KEY")
@@ -33,6 +44,62 @@ PLEO_API_KEY = os.getenv("PLEO_API_KEY")
 if not PLEO_API_KEY:
     logger.warning("PLEO_API_KEY environment variable not set")
 
+# Connection pool limits shared by all tool invocations
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=100)
+
+# Chunk size used when streaming downloaded files to their destination
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Short-lived cache for idempotent GET responses
+RESPONSE_CACHE_SIZE = 256
+RESPONSE_CACHE_TTL = 60.0
+
+# Receipt download URLs are signed for 15 hours; keep them a little less
+RECEIPT_URL_VALID_HOURS = 15
+RECEIPT_CACHE_SIZE = 4096
+RECEIPT_CACHE_TTL = 14 * 3600.0
+RECEIPT_ENDPOINT = re.compile(r"^/expenses/[^/]+/receipts/[^/]+$")
+
+# Retry policy for rate-limited and transient server errors
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+RETRY_ATTEMPTS = 4
+RETRY_AFTER_MAX = 30.0
+
+# Headers sent with every Pleo API request, alongside the bearer token.
+# Kept as pre-encoded byte pairs so httpx stores them without re-encoding.
+# httpx adds Accept-Encoding itself, including br when brotli is installed.
+DEFAULT_HEADERS = [
+    (b"accept", b"application/json"),
+    (b"content-type", b"application/json")
+]
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Check whether a failed request is worth retrying."""
+    return isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code in RETRY_STATUS_CODES
+
+
+backoff = wait_exponential_jitter(initial=1, max=10)
+
+
+def wait_retry_after(retry_state: RetryCallState) -> float:
+    """Wait as long as the Retry-After header asks, else back off exponentially."""
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, httpx.HTTPStatusError):
+        retry_after = exc.response.headers.get("Retry-After", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), RETRY_AFTER_MAX)
+    return backoff(retry_state)
+
+
+retry_transient = retry(
+    retry=retry_if_exception(is_retryable),
+    wait=wait_retry_after,
+    stop=stop_after_attempt(RETRY_ATTEMPTS),
+    before_sleep=before_sleep_log(logger, logging.WARNING),
+    reraise=True
+)
+
 
 class PleoAPIClient:
     """Client for interacting with the Pleo API."""
@@ -40,50 +107,330 @@ class PleoAPIClient:
     def __init__(self, api_key: str):
         self.api_key = api_key
         self.base_url = PLEO_API_BASE_URL
-        self.headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
+        # Pooled HTTP/2 connections to the Pleo API, reused across requests.
+        # The transport retries failed connection attempts on transient resets.
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=[(b"authorization", b"Bearer " + api_key.encode()), *DEFAULT_HEADERS],
+            timeout=30.0,
+            transport=httpx.AsyncHTTPTransport(http2=True, retries=2, limits=HTTP_LIMITS)
+        )
+        # Separate pool without the API credentials for external file URLs.
+        # It stays on httpx: no tool downloads files yet, so a second HTTP
+        # stack (e.g. aiohttp) would add a dependency with no measured gain.
+        self._download_client = httpx.AsyncClient(timeout=60.0, limits=HTTP_LIMITS)
+        # Parsed GET responses keyed by endpoint and query parameters
+        self._cache = TTLCache(maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+        # Single receipts are kept as long as their signed download URL is valid
+        self._receipt_cache = TTLCache(maxsize=RECEIPT_CACHE_SIZE, ttl=RECEIPT_CACHE_TTL)
+        # GETs currently on the wire, so identical concurrent requests share one
+        self._inflight: Dict[Tuple[str, tuple], asyncio.Task] = {}
     
     async def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """Make a GET request to the Pleo API."""
-        async with httpx.AsyncClient() as client:
-            url = f"{self.base_url}{endpoint}"
-            response = await client.get(url, headers=self.headers, params=params, timeout=30.0)
-            response.raise_for_status()
-            return response.json()
+        """Make a GET request to the Pleo API, raising if the resource does not exist."""
+        result = await self.get_or_none(endpoint, params)
+        if result is None:
+            raise LookupError(f"Pleo API resource not found: {endpoint}")
+        return result
+    
+    async def get_or_none(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Make a cached GET request to the Pleo API, returning None on 404."""
+        key = (endpoint, tuple(sorted(params.items())) if params else ())
+        try:
+            return self._cache_for(endpoint)[key]
+        except KeyError:
+            pass
+        
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(endpoint, params))
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._settle, key))
+        # Shield the shared fetch so one cancelled caller does not fail the others
+        return await asyncio.shield(task)
+    
+    def _settle(self, key: Tuple[str, tuple], task: asyncio.Task) -> None:
+        """Cache a finished fetch unless it was invalidated while in flight."""
+        if self._inflight.get(key) is not task:
+            return
+        del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        if task.result() is not None:
+            self._cache_for(key[0])[key] = task.result()
+    
+    def remember(self, endpoint: str, data: Dict[str, Any]) -> None:
+        """Cache a response for an endpoint that was obtained some other way, e.g. from a list."""
+        self._cache_for(endpoint)[(endpoint, ())] = data
+    
+    def _cache_for(self, endpoint: str) -> TTLCache:
+        """Pick the cache that holds responses for an endpoint."""
+        return self._receipt_cache if RECEIPT_ENDPOINT.match(endpoint) else self._cache
     
+    @retry_transient
+    async def _fetch(self, endpoint: str, params: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Fetch and parse a GET response, retrying transient failures."""
+        response = await self._client.get(endpoint, params=params)
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return orjson.loads(response.content)
+    
+    @retry_transient
     async def put(self, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """Make a PUT request to the Pleo API."""
-        async with httpx.AsyncClient() as client:
-            url = f"{self.base_url}{endpoint}"
-            response = await client.put(url, headers=self.headers, json=data, timeout=30.0)
-            response.raise_for_status()
-            return response.json()
+        try:
+            response = await self._client.put(endpoint, content=orjson.dumps(data))
+        finally:
+            # Even a failed or timed-out PUT may have been applied upstream
+            self.invalidate(endpoint)
+        response.raise_for_status()
+        return orjson.loads(response.content)
     
-    async def download_file(self, url: str) -> bytes:
-        """Download a file from a URL."""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, timeout=60.0)
+    def invalidate(self, *endpoints: str) -> None:
+        """
+        Drop cached responses for endpoints, their sub-resources and their parent collections.
+        
+        In-flight GETs for those endpoints are detached as well, so their
+        responses still reach the callers waiting on them but are not cached.
+        """
+        exact = set(endpoints) | {endpoint.rsplit("/", 1)[0] for endpoint in endpoints}
+        prefixes = tuple(f"{endpoint}/" for endpoint in endpoints)
+        
+        for store in (self._cache, self._receipt_cache, self._inflight):
+            stale = [key for key in store if key[0] in exact or key[0].startswith(prefixes)]
+            for key in stale:
+                store.pop(key, None)
+    
+    async def download_file(self, url: str, dest: BinaryIO) -> int:
+        """
+        Stream a file from a URL into a writable binary file object.
+        
+        Pass an io.BytesIO() as dest when the content is needed in memory.
+        Returns the number of bytes written.
+        """
+        written = 0
+        async with self._download_client.stream("GET", url) as response:
             response.raise_for_status()
-            return response.content
+            async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                dest.write(chunk)
+                written += len(chunk)
+        return written
+    
+    async def aclose(self) -> None:
+        """Close the underlying connection pools."""
+        self._cache.clear()
+        self._receipt_cache.clear()
+        await self._client.aclose()
+        await self._download_client.aclose()
 
 
+@functools.lru_cache(maxsize=1)
 def get_client() -> PleoAPIClient:
-    """Get an instance of the Pleo API client."""
+    """Get the shared instance of the Pleo API client."""
     if not PLEO_API_KEY:
         raise ValueError("PLEO_API_KEY environment variable is not set")
     return PleoAPIClient(PLEO_API_KEY)
 
 
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    """Close the shared Pleo API client when the server shuts down."""
+    try:
+        yield
+    finally:
+        if get_client.cache_info().currsize:
+            await get_client().aclose()
+            get_client.cache_clear()
+
+
+# Initialize FastMCP server
+mcp = FastMCP("pleo-mcp", lifespan=lifespan)
+
+
+def empty_as_none(value: Any) -> Any:
+    """Treat an empty nested object from the API as a missing one."""
+    return value or None
+
+
+class PleoModel(BaseModel):
+    """Base for Pleo API payloads; missing fields are None, others are ignored."""
+    
+    model_config = ConfigDict(extra="ignore")
+    
+    def display_fields(self, **defaults: Any) -> Dict[str, Any]:
+        """
+        Map field names to the values shown in text output.
+        
+        Fields the API sent are shown as sent, even when null. Fields it
+        left out are shown as their entry in defaults, or as N/A.
+        """
+        fields = {name: defaults.get(name, "N/A") for name in type(self).model_fields}
+        fields.update((name, getattr(self, name)) for name in self.model_fields_set)
+        return fields
+
+
+class Amount(PleoModel):
+    """A monetary amount in a given currency."""
+    
+    value: Any = None
+    currency: Optional[str] = None
+    
+    def __str__(self) -> str:
+        return "{value} {currency}".format(**self.display_fields(value=0))
+
+
+class Merchant(PleoModel):
+    """The merchant of a card transaction."""
+    
+    id: Optional[str] = None
+    name: Optional[str] = None
+
+
+class CardTransaction(PleoModel):
+    """Card transaction details attached to an expense."""
+    
+    state: Optional[str] = None
+    authorizedAt: Optional[str] = None
+    settledAt: Optional[str] = None
+    merchant: Annotated[Optional[Merchant], BeforeValidator(empty_as_none)] = None
+
+
+class Expense(PleoModel):
+    """An expense as returned by the Pleo API."""
+    
+    id: Optional[str] = None
+    employeeId: Optional[str] = None
+    employeeCode: Optional[str] = None
+    departmentId: Optional[str] = None
+    performedAt: Optional[str] = None
+    amountOriginal: Annotated[Optional[Amount], BeforeValidator(empty_as_none)] = None
+    amountSettled: Annotated[Optional[Amount], BeforeValidator(empty_as_none)] = None
+    note: Optional[str] = None
+    type: Optional[str] = None
+    status: Optional[str] = None
+    accountId: Optional[str] = None
+    taxCodeId: Optional[str] = None
+    receiptIds: Optional[List[str]] = None
+    cardTransaction: Annotated[Optional[CardTransaction], BeforeValidator(empty_as_none)] = None
+    createdAt: Optional[str] = None
+    updatedAt: Optional[str] = None
+
+
+class ExpenseList(PleoModel):
+    """A page of expenses from the Pleo API."""
+    
+    data: List[Expense] = []
+
+
+class Receipt(PleoModel):
+    """A receipt attached to an expense."""
+    
+    id: Optional[str] = None
+    name: Optional[str] = None
+    mimeType: Optional[str] = None
+    size: Any = None
+    url: Optional[str] = None
+
+
+ReceiptList = TypeAdapter(List[Receipt])
+
+
+# Text output templates, filled in from PleoModel.display_fields()
+EXPENSE_ROW_TEMPLATE = (
+    "- ID: {id}\n"
+    "  Date: {performedAt}\n"
+    "  Amount: {amount}\n"
+    "  Type: {type}\n"
+    "  Status: {status}\n"
+    "  Note: {note}\n\n"
+)
+
+EXPENSE_DETAILS_TEMPLATE = (
+    "Expense Details:\n\n"
+    "ID: {id}\n"
+    "Employee ID: {employeeId}\n"
+    "Employee Code: {employeeCode}\n"
+    "Department ID: {departmentId}\n"
+    "Performed At: {performedAt}\n"
+    "Original Amount: {amount}\n"
+    "{settled}"
+    "Note: {note}\n"
+    "Type: {type}\n"
+    "Status: {status}\n"
+    "Account ID: {accountId}\n"
+    "Tax Code ID: {taxCodeId}\n"
+    "Receipt IDs: {receipt_ids}\n"
+    "{card_transaction}"
+    "\nCreated At: {createdAt}\n"
+    "Updated At: {updatedAt}\n"
+)
+
+CARD_TRANSACTION_TEMPLATE = (
+    "\nCard Transaction:\n"
+    "  State: {state}\n"
+    "  Authorized At: {authorizedAt}\n"
+    "  Settled At: {settledAt}\n"
+)
+
+MERCHANT_TEMPLATE = "  Merchant: {name} (ID: {id})\n"
+
+RECEIPT_ROW_TEMPLATE = (
+    "- Receipt ID: {id}\n"
+    "  Name: {name}\n"
+    "  Type: {mimeType}\n"
+    "  Size: {size} KB\n"
+    "  Download URL: {url}\n"
+    "  (URL valid for 15 hours)\n\n"
+)
+
+RECEIPT_DETAILS_TEMPLATE = (
+    "Receipt Details:\n\n"
+    "ID: {id}\n"
+    "Name: {name}\n"
+    "MIME Type: {mimeType}\n"
+    "Size: {size} KB\n"
+    "Download URL: {url}\n"
+    "(URL valid for 15 hours)\n"
+)
+
+
+# Output formats accepted by the read tools
+OutputFormat = Literal["text", "json"]
+
+
+def to_json(data: Any) -> str:
+    """Serialise tool output as a compact JSON document."""
+    return orjson.dumps(data).decode()
+
+
+def error_result(message: str, format: OutputFormat) -> str:
+    """Render a tool error in the requested output format."""
+    if format == "json":
+        return to_json({"error": message})
+    return f"Error: {message}"
+
+
+# list_expenses filter arguments and the Pleo query parameters they map to
+LIST_EXPENSES_FILTERS = {
+    "status": "status",
+    "expense_type": "type",
+    "from_date": "performedAtFrom",
+    "to_date": "performedAtTo"
+}
+
+# Largest page size accepted by the Pleo expenses endpoint
+MAX_LIST_LIMIT = 100
+
+
 @mcp.tool()
 async def list_expenses(
     status: Optional[str] = None,
     expense_type: Optional[str] = None,
     from_date: Optional[str] = None,
     to_date: Optional[str] = None,
-    limit: int = 50
+    limit: int = 50,
+    format: OutputFormat = "json"
 ) -> str:
     """
     List all expenses for your company with optional filtering.
@@ -94,130 +441,97 @@ async def list_expenses(
         from_date: Filter expenses from this date (YYYY-MM-DD format)
         to_date: Filter expenses to this date (YYYY-MM-DD format)
         limit: Maximum number of results to return (default: 50, max: 100)
+        format: Output format, "json" (default) or "text"
     
     Returns:
         JSON string containing the list of expenses
     """
+    arguments = locals()
     try:
         client = get_client()
         
-        # Build query parameters
-        params = {"limit": min(limit, 100)}
-        
-        if status:
-            params["status"] = status
-        if expense_type:
-            params["type"] = expense_type
-        if from_date:
-            params["performedAtFrom"] = from_date
-        if to_date:
-            params["performedAtTo"] = to_date
+        # Build query parameters from the filters that were given
+        params = {
+            param: arguments[argument]
+            for argument, param in LIST_EXPENSES_FILTERS.items()
+            if arguments[argument]
+        }
+        params["limit"] = min(limit, MAX_LIST_LIMIT)
         
         # Make API request
         result = await client.get("/expenses", params=params)
         
         # Format response
-        expenses = result.get("data", [])
+        expenses = ExpenseList.model_validate(result).data
+        
+        if format == "json":
+            return to_json({
+                "count": len(expenses),
+                "expenses": [expense.model_dump() for expense in expenses]
+            })
         
         if not expenses:
             return "No expenses found matching the criteria."
         
         # Create summary
-        summary = f"Found {len(expenses)} expense(s):\n\n"
+        parts: List[str] = [f"Found {len(expenses)} expense(s):\n\n"]
         
         for expense in expenses:
-            expense_id = expense.get("id", "N/A")
-            performed_at = expense.get("performedAt", "N/A")
-            amount = expense.get("amountOriginal", {})
-            value = amount.get("value", 0)
-            currency = amount.get("currency", "N/A")
-            note = expense.get("note", "No note")
-            exp_type = expense.get("type", "N/A")
-            exp_status = expense.get("status", "N/A")
-            
-            summary += f"- ID: {expense_id}\n"
-            summary += f"  Date: {performed_at}\n"
-            summary += f"  Amount: {value} {currency}\n"
-            summary += f"  Type: {exp_type}\n"
-            summary += f"  Status: {exp_status}\n"
-            summary += f"  Note: {note}\n\n"
-        
-        return summary
+            parts.append(EXPENSE_ROW_TEMPLATE.format(
+                **expense.display_fields(note="No note"),
+                amount=expense.amountOriginal or Amount()
+            ))
+        
+        return "".join(parts)
         
     except Exception as e:
-        logger.error(f"Error listing expenses: {e}")
-        return f"Error: {str(e)}"
+        logger.error("Error listing expenses: %s", e)
+        return error_result(str(e), format)
 
 
 @mcp.tool()
-async def get_expense(expense_id: str) -> str:
+async def get_expense(expense_id: str, format: OutputFormat = "json") -> str:
     """
     Get detailed information about a specific expense.
     
     Args:
         expense_id: The UUID of the expense
+        format: Output format, "json" (default) or "text"
     
     Returns:
         JSON string containing detailed expense information
     """
     try:
         client = get_client()
-        expense = await client.get(f"/expenses/{expense_id}")
-        
-        # Format detailed response
-        result = "Expense Details:\n\n"
-        result += f"ID: {expense.get('id', 'N/A')}\n"
-        result += f"Employee ID: {expense.get('employeeId', 'N/A')}\n"
-        result += f"Employee Code: {expense.get('employeeCode', 'N/A')}\n"
-        result += f"Department ID: {expense.get('departmentId', 'N/A')}\n"
-        result += f"Performed At: {expense.get('performedAt', 'N/A')}\n"
-        
-        # Amount information
-        amount_original = expense.get('amountOriginal', {})
-        result += f"Original Amount: {amount_original.get('value', 0)} {amount_original.get('currency', 'N/A')}\n"
-        
-        amount_settled = expense.get('amountSettled', {})
-        if amount_settled:
-            result += f"Settled Amount: {amount_settled.get('value', 0)} {amount_settled.get('currency', 'N/A')}\n"
-        
-        result += f"Note: {expense.get('note', 'No note')}\n"
-        result += f"Type: {expense.get('type', 'N/A')}\n"
-        result += f"Status: {expense.get('status', 'N/A')}\n"
-        
-        # Accounting information
-        result += f"Account ID: {expense.get('accountId', 'N/A')}\n"
-        result += f"Tax Code ID: {expense.get('taxCodeId', 'N/A')}\n"
-        
-        # Receipt information
-        receipt_ids = expense.get('receiptIds', [])
-        result += f"Receipt IDs: {', '.join(receipt_ids) if receipt_ids else 'None'}\n"
-        
-        # Card transaction details
-        card_transaction = expense.get('cardTransaction', {})
-        if card_transaction:
-            result += "\nCard Transaction:\n"
-            result += f"  State: {card_transaction.get('state', 'N/A')}\n"
-            result += f"  Authorized At: {card_transaction.get('authorizedAt', 'N/A')}\n"
-            result += f"  Settled At: {card_transaction.get('settledAt', 'N/A')}\n"
-            
-            merchant = card_transaction.get('merchant', {})
-            if merchant:
-                result += f"  Merchant: {merchant.get('name', 'N/A')} (ID: {merchant.get('id', 'N/A')})\n"
-        
-        # Timestamps
-        result += f"\nCreated At: {expense.get('createdAt', 'N/A')}\n"
-        result += f"Updated At: {expense.get('updatedAt', 'N/A')}\n"
+        data = await client.get_or_none(f"/expenses/{expense_id}")
+        if data is None:
+            return error_result(f"Expense with ID {expense_id} not found", format)
+        expense = Expense.model_validate(data)
         
-        return result
+        if format == "json":
+            return to_json(expense.model_dump())
+        
+        # Optional sections
+        settled = f"Settled Amount: {expense.amountSettled}\n" if expense.amountSettled else ""
+        
+        card = ""
+        card_transaction = expense.cardTransaction
+        if card_transaction:
+            card = CARD_TRANSACTION_TEMPLATE.format(**card_transaction.display_fields())
+            if card_transaction.merchant:
+                card += MERCHANT_TEMPLATE.format(**card_transaction.merchant.display_fields())
+        
+        return EXPENSE_DETAILS_TEMPLATE.format(
+            **expense.display_fields(note="No note"),
+            amount=expense.amountOriginal or Amount(),
+            settled=settled,
+            receipt_ids=', '.join(expense.receiptIds) if expense.receiptIds else 'None',
+            card_transaction=card
+        )
         
-    except httpx.HTTPStatusError as e:
-        if e.response.status_code == 404:
-            return f"Error: Expense with ID {expense_id} not found"
-        logger.error(f"HTTP error getting expense: {e}")
-        return f"Error: {str(e)}"
     except Exception as e:
-        logger.error(f"Error getting expense: {e}")
-        return f"Error: {str(e)}"
+        logger.error("Error getting expense: %s", e)
+        return error_result(str(e), format)
 
 
 @mcp.tool()
@@ -263,93 +577,149 @@ async def update_expense(
     except httpx.HTTPStatusError as e:
         if e.response.status_code == 404:
             return f"Error: Expense with ID {expense_id} not found"
-        logger.error(f"HTTP error updating expense: {e}")
+        logger.error("HTTP error updating expense: %s", e)
         return f"Error: {str(e)}"
     except Exception as e:
-        logger.error(f"Error updating expense: {e}")
+        logger.error("Error updating expense: %s", e)
         return f"Error: {str(e)}"
 
 
+async def fetch_receipts(client: PleoAPIClient, expense_id: str) -> Optional[List[Receipt]]:
+    """
+    Fetch the receipts attached to an expense, or None if the expense does not exist.
+    
+    The list carries each receipt's full details, so every receipt with an ID
+    is also cached under its own endpoint for get_expense_receipt.
+    """
+    data = await client.get_or_none(f"/expenses/{expense_id}/receipts")
+    if data is None:
+        return None
+    receipts = ReceiptList.validate_python(data)
+    
+    for raw, receipt in zip(data, receipts):
+        if receipt.id:
+            client.remember(f"/expenses/{expense_id}/receipts/{receipt.id}", raw)
+    
+    return receipts
+
+
+def receipts_json(expense_id: str, receipts: List[Receipt], **summary: Any) -> str:
+    """Render a receipt list as the JSON document returned by the receipt tools."""
+    return to_json({
+        "expenseId": expense_id,
+        "count": len(receipts),
+        **summary,
+        "urlValidHours": RECEIPT_URL_VALID_HOURS,
+        "receipts": [receipt.model_dump() for receipt in receipts]
+    })
+
+
+def receipts_text(heading: str, receipts: List[Receipt]) -> str:
+    """Render a receipt list as text, one row per receipt below a heading."""
+    parts: List[str] = [heading]
+    
+    for receipt in receipts:
+        parts.append(RECEIPT_ROW_TEMPLATE.format(**receipt.display_fields(size=0)))
+    
+    return "".join(parts)
+
+
 @mcp.tool()
-async def get_expense_receipts(expense_id: str) -> str:
+async def get_expense_receipts(expense_id: str, format: OutputFormat = "json") -> str:
     """
     Get all receipts attached to an expense.
     
     Args:
         expense_id: The UUID of the expense
+        format: Output format, "json" (default) or "text"
     
     Returns:
         Information about all receipts attached to the expense
     """
     try:
-        client = get_client()
-        receipts = await client.get(f"/expenses/{expense_id}/receipts")
+        receipts = await fetch_receipts(get_client(), expense_id)
+        if receipts is None:
+            return error_result(f"Expense with ID {expense_id} not found", format)
+        
+        if format == "json":
+            return receipts_json(expense_id, receipts)
         
         if not receipts:
             return f"No receipts found for expense {expense_id}"
         
-        result = f"Receipts for expense {expense_id}:\n\n"
-        
-        for receipt in receipts:
-            receipt_id = receipt.get("id", "N/A")
-            name = receipt.get("name", "N/A")
-            mime_type = receipt.get("mimeType", "N/A")
-            size = receipt.get("size", 0)
-            url = receipt.get("url", "N/A")
-            
-            result += f"- Receipt ID: {receipt_id}\n"
-            result += f"  Name: {name}\n"
-            result += f"  Type: {mime_type}\n"
-            result += f"  Size: {size} KB\n"
-            result += f"  Download URL: {url}\n"
-            result += f"  (URL valid for 15 hours)\n\n"
-        
-        return result
+        return receipts_text(f"Receipts for expense {expense_id}:\n\n", receipts)
         
-    except httpx.HTTPStatusError as e:
-        if e.response.status_code == 404:
-            return f"Error: Expense with ID {expense_id} not found"
-        logger.error(f"HTTP error getting receipts: {e}")
-        return f"Error: {str(e)}"
     except Exception as e:
-        logger.error(f"Error getting receipts: {e}")
-        return f"Error: {str(e)}"
+        logger.error("Error getting receipts: %s", e)
+        return error_result(str(e), format)
 
 
 @mcp.tool()
-async def get_expense_receipt(expense_id: str, receipt_id: str) -> str:
+async def get_expense_receipt(expense_id: str, receipt_id: str, format: OutputFormat = "json") -> str:
     """
     Get information about a specific receipt attached to an expense.
     
     Args:
         expense_id: The UUID of the expense
         receipt_id: The UUID of the receipt
+        format: Output format, "json" (default) or "text"
     
     Returns:
         Information about the specific receipt including download URL
     """
     try:
         client = get_client()
-        receipt = await client.get(f"/expenses/{expense_id}/receipts/{receipt_id}")
+        data = await client.get_or_none(f"/expenses/{expense_id}/receipts/{receipt_id}")
+        if data is None:
+            return error_result(f"Receipt with ID {receipt_id} not found for expense {expense_id}", format)
+        receipt = Receipt.model_validate(data)
         
-        result = "Receipt Details:\n\n"
-        result += f"ID: {receipt.get('id', 'N/A')}\n"
-        result += f"Name: {receipt.get('name', 'N/A')}\n"
-        result += f"MIME Type: {receipt.get('mimeType', 'N/A')}\n"
-        result += f"Size: {receipt.get('size', 0)} KB\n"
-        result += f"Download URL: {receipt.get('url', 'N/A')}\n"
-        result += f"(URL valid for 15 hours)\n"
+        if format == "json":
+            return to_json({**receipt.model_dump(), "urlValidHours": RECEIPT_URL_VALID_HOURS})
         
-        return result
+        return RECEIPT_DETAILS_TEMPLATE.format(**receipt.display_fields(size=0))
         
-    except httpx.HTTPStatusError as e:
-        if e.response.status_code == 404:
-            return f"Error: Receipt with ID {receipt_id} not found for expense {expense_id}"
-        logger.error(f"HTTP error getting receipt: {e}")
-        return f"Error: {str(e)}"
     except Exception as e:
-        logger.error(f"Error getting receipt: {e}")
-        return f"Error: {str(e)}"
+        logger.error("Error getting receipt: %s", e)
+        return error_result(str(e), format)
+
+
+@mcp.tool()
+async def get_all_expense_receipts_detailed(expense_id: str, format: OutputFormat = "json") -> str:
+    """
+    Get detailed information about every receipt attached to an expense.
+    
+    The receipt list already carries each receipt's full details, so this
+    makes a single request, and follow-up get_expense_receipt calls for
+    these receipts are served from the cache.
+    
+    Args:
+        expense_id: The UUID of the expense
+        format: Output format, "json" (default) or "text"
+    
+    Returns:
+        Details for each receipt including download URLs
+    """
+    try:
+        receipts = await fetch_receipts(get_client(), expense_id)
+        if receipts is None:
+            return error_result(f"Expense with ID {expense_id} not found", format)
+        without_id = sum(1 for receipt in receipts if not receipt.id)
+        
+        if format == "json":
+            return receipts_json(expense_id, receipts, withoutId=without_id)
+        
+        if not receipts:
+            return f"No receipts found for expense {expense_id}"
+        
+        text = receipts_text(f"Receipt details for expense {expense_id}:\n\n", receipts)
+        if without_id:
+            text += f"Note: {without_id} receipt(s) have no ID\n"
+        return text
+        
+    except Exception as e:
+        logger.error("Error getting receipt details: %s", e)
+        return error_result(str(e), format)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,272 @@
+'''
+Offline checks for the Pleo API client.
+
+This script runs PleoAPIClient, and the tools built on it, against an
+httpx.MockTransport instead of the live Pleo API, so their request handling
+can be verified without an API key.
+'''
+
+import asyncio
+import io
+import json
+import os
+import time
+
+import httpx
+
+# The server refuses to build a client without a key; any value works offline
+os.environ.setdefault("PLEO_API_KEY", "test-key")
+
+from server import DOWNLOAD_CHUNK_SIZE, PLEO_API_BASE_URL, Expense, PleoAPIClient, get_client, get_expense, list_expenses
+
+
+async def mock_client(client: PleoAPIClient, handler) -> PleoAPIClient:
+    '''Answer a client's requests with handler, closing the pools it opened.'''
+    await client._client.aclose()
+    await client._download_client.aclose()
+    client._client = httpx.AsyncClient(base_url=PLEO_API_BASE_URL, transport=httpx.MockTransport(handler))
+    client._download_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+async def make_client(handler) -> PleoAPIClient:
+    '''Build a client whose Pleo API requests are answered by handler.'''
+    return await mock_client(PleoAPIClient("test-key"), handler)
+
+
+async def make_shared_client(handler) -> PleoAPIClient:
+    '''Reset the client shared by the tools and answer its requests with handler.'''
+    get_client.cache_clear()
+    return await mock_client(get_client(), handler)
+
+
+async def check_repeated_get_is_cached():
+    '''A repeated GET within the TTL is served from the cache.'''
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"id": "e1"})
+
+    client = await make_client(handler)
+    assert await client.get("/expenses/e1") == {"id": "e1"}
+    assert await client.get("/expenses/e1") == {"id": "e1"}
+    assert len(requests) == 1, f"expected a cache hit, got {len(requests)} requests"
+    await client.aclose()
+
+
+async def check_failed_put_invalidates():
+    '''A rejected PUT still drops the cached expense and expense list.'''
+    requests = []
+
+    def handler(request):
+        requests.append(request.method)
+        if request.method == "PUT":
+            return httpx.Response(400, json={"message": "invalid"})
+        return httpx.Response(200, json={"version": requests.count("GET")})
+
+    client = await make_client(handler)
+    await client.get("/expenses/e1")
+    await client.get("/expenses")
+    try:
+        await client.put("/expenses/e1", {"note": "updated"})
+        raise AssertionError("expected the PUT to raise")
+    except httpx.HTTPStatusError:
+        pass
+
+    assert await client.get("/expenses/e1") == {"version": 3}
+    assert await client.get("/expenses") == {"version": 4}
+    assert requests == ["GET", "GET", "PUT", "GET", "GET"], f"unexpected requests: {requests}"
+    await client.aclose()
+
+
+async def check_download_is_streamed():
+    '''A download is written to the destination in chunks, without the API key.'''
+    requests = []
+    content = os.urandom(DOWNLOAD_CHUNK_SIZE * 2 + 1)
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, content=content)
+
+    class Destination(io.BytesIO):
+        writes = 0
+
+        def write(self, chunk):
+            self.writes += 1
+            return super().write(chunk)
+
+    client = await make_client(handler)
+    dest = Destination()
+    written = await client.download_file("https://files.example.com/receipt.pdf", dest)
+    assert written == len(content), f"expected {len(content)} bytes written, got {written}"
+    assert dest.getvalue() == content, "downloaded content does not match"
+    assert dest.writes == 3, f"expected 3 chunked writes, got {dest.writes}"
+    assert "authorization" not in requests[0].headers, "download sent the API key"
+    await client.aclose()
+
+
+async def check_rate_limit_is_retried():
+    '''A 429 with Retry-After is retried after the requested delay.'''
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if len(requests) == 1:
+            return httpx.Response(429, headers={"Retry-After": "1"})
+        return httpx.Response(200, json={"data": []})
+
+    client = await make_client(handler)
+    started = time.monotonic()
+    assert await client.get("/expenses") == {"data": []}
+    elapsed = time.monotonic() - started
+    assert len(requests) == 2, f"expected 2 requests, got {len(requests)}"
+    assert elapsed >= 1.0, f"retried after {elapsed:.2f}s despite Retry-After: 1"
+    await client.aclose()
+
+
+async def check_receipt_cache_is_invalidated():
+    '''Receipts are kept in their own cache, and invalidating an expense drops them.'''
+    requests = []
+
+    def handler(request):
+        requests.append(request.url.path)
+        return httpx.Response(200, json={"id": "r1"})
+
+    client = await make_client(handler)
+    await client.get("/expenses/e1/receipts/r1")
+    assert len(client._receipt_cache) == 1, "receipt was not stored in the receipt cache"
+    assert len(client._cache) == 0, "receipt was stored in the short-lived cache"
+
+    client.invalidate("/expenses/e1")
+    await client.get("/expenses/e1/receipts/r1")
+    assert len(requests) == 2, f"expected the receipt to be re-fetched, got {len(requests)} requests"
+    await client.aclose()
+
+
+async def check_missing_expense_is_reported():
+    '''A 404 is returned as None by get_or_none and reported as not found by the tools.'''
+    def handler(request):
+        return httpx.Response(404, json={"message": "not found"})
+
+    client = await make_shared_client(handler)
+    assert await client.get_or_none("/expenses/nope") is None
+    try:
+        await client.get("/expenses/nope")
+        raise AssertionError("expected get() to raise LookupError")
+    except LookupError:
+        pass
+
+    result = await get_expense.fn(expense_id="nope", format="text")
+    assert result == "Error: Expense with ID nope not found", f"unexpected result: {result}"
+    await client.aclose()
+
+
+async def check_list_filters_build_the_query():
+    '''list_expenses sends only the filters given, under their Pleo names, with a capped limit.'''
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"data": []})
+
+    client = await make_shared_client(handler)
+    await list_expenses.fn(status="EXPORTED", from_date="2024-01-01", limit=500)
+    params = dict(requests[0].url.params)
+    expected = {"status": "EXPORTED", "performedAtFrom": "2024-01-01", "limit": "100"}
+    assert params == expected, f"unexpected query: {params}"
+    await client.aclose()
+
+
+async def check_json_output():
+    '''JSON output has one key per model field, null where the API left it out.'''
+    def handler(request):
+        if request.url.path.endswith("/expenses"):
+            return httpx.Response(200, json={"data": [{"id": "e1", "amountOriginal": {}, "note": "lunch"}]})
+        return httpx.Response(404)
+
+    client = await make_shared_client(handler)
+    listing = json.loads(await list_expenses.fn())
+    assert listing["count"] == 1, f"unexpected count: {listing['count']}"
+    expense = listing["expenses"][0]
+    assert set(expense) == set(Expense.model_fields), f"unexpected keys: {sorted(expense)}"
+    assert expense["id"] == "e1" and expense["note"] == "lunch", f"unexpected expense: {expense}"
+    assert expense["amountOriginal"] is None, f"empty amount not null: {expense['amountOriginal']}"
+    assert expense["status"] is None, f"missing status not null: {expense['status']}"
+
+    missing = json.loads(await get_expense.fn(expense_id="nope"))
+    assert missing == {"error": "Expense with ID nope not found"}, f"unexpected error: {missing}"
+    await client.aclose()
+
+
+async def check_concurrent_gets_are_coalesced():
+    '''Two concurrent identical GETs cause exactly one request.'''
+    requests = []
+
+    async def handler(request):
+        requests.append(request)
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json={"id": "e1"})
+
+    client = await make_client(handler)
+    first, second = await asyncio.gather(client.get("/expenses/e1"), client.get("/expenses/e1"))
+    assert first == second == {"id": "e1"}
+    assert len(requests) == 1, f"expected 1 request, got {len(requests)}"
+    await client.aclose()
+
+
+async def check_put_during_get_is_not_cached():
+    '''A PUT landing while a GET is in flight stops that GET's result being cached.'''
+    requests = []
+    release = asyncio.Event()
+
+    async def handler(request):
+        requests.append(request.method)
+        if request.method == "PUT":
+            return httpx.Response(200, json={})
+        await release.wait()
+        return httpx.Response(200, json={"note": f"version {requests.count('GET')}"})
+
+    client = await make_client(handler)
+    stale_get = asyncio.ensure_future(client.get("/expenses/e1"))
+    await asyncio.sleep(0.01)
+    await client.put("/expenses/e1", {"note": "updated"})
+    release.set()
+
+    assert await stale_get == {"note": "version 1"}
+    assert await client.get("/expenses/e1") == {"note": "version 2"}
+    assert requests == ["GET", "PUT", "GET"], f"unexpected requests: {requests}"
+    await client.aclose()
+
+
+async def main():
+    '''Main function to run the checks.'''
+    print("--- Running Pleo client checks ---")
+
+    checks = [
+        check_repeated_get_is_cached,
+        check_failed_put_invalidates,
+        check_download_is_streamed,
+        check_rate_limit_is_retried,
+        check_receipt_cache_is_invalidated,
+        check_missing_expense_is_reported,
+        check_list_filters_build_the_query,
+        check_json_output,
+        check_concurrent_gets_are_coalesced,
+        check_put_during_get_is_not_cached,
+    ]
+    failures = 0
+    for check in checks:
+        try:
+            await check()
+            print(f"[PASS] {check.__doc__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"[FAIL] {check.__doc__} {e}")
+
+    print("\n--- Checks Finished ---")
+    return failures
+
+
+if __name__ == "__main__":
+    raise SystemExit(1 if asyncio.run(main()) else 0)
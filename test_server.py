@@ -6,6 +6,7 @@ without needing to run the full MCP server and client.
 '''
 
 import asyncio
+import json
 import os
 from dotenv import load_dotenv
 
@@ -13,7 +14,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # Import the tool functions from the server file
-from server import list_expenses, get_expense, update_expense, get_expense_receipts, get_expense_receipt
+from server import list_expenses, get_expense, update_expense, get_expense_receipts, get_expense_receipt, get_all_expense_receipts_detailed
 
 async def main():
     '''Main function to run the tests.'''
@@ -26,12 +27,13 @@ async def main():
         print("Result:\n", recent_expenses)
         # Extract an expense ID for further tests
         first_expense_id = None
-        if "ID:" in recent_expenses:
-            try:
-                first_expense_id = recent_expenses.split("ID: ")[1].split("\n")[0]
+        try:
+            expenses = json.loads(recent_expenses)["expenses"]
+            first_expense_id = next((expense["id"] for expense in expenses if expense["id"]), None)
+            if first_expense_id:
                 print(f"Extracted expense ID for next tests: {first_expense_id}")
-            except IndexError:
-                print("Could not extract an expense ID.")
+        except (ValueError, KeyError, IndexError):
+            print("Could not extract an expense ID.")
 
     except Exception as e:
         print(f"Error during list_expenses test: {e}")
@@ -46,14 +48,17 @@ async def main():
             print("Result:\n", expense_details)
             # Extract a receipt ID if available
             first_receipt_id = None
-            if "Receipt IDs:" in expense_details:
-                try:
-                    receipt_ids_str = expense_details.split("Receipt IDs: ")[1].split("\n")[0]
-                    if receipt_ids_str and receipt_ids_str != "None":
-                        first_receipt_id = receipt_ids_str.split(", ")[0]
-                        print(f"Extracted receipt ID for next test: {first_receipt_id}")
-                except (IndexError, ValueError):
-                    print("Could not extract a receipt ID.")
+            try:
+                receipt_ids = json.loads(expense_details)["receiptIds"]
+                if receipt_ids:
+                    first_receipt_id = receipt_ids[0]
+                    print(f"Extracted receipt ID for next test: {first_receipt_id}")
+            except (ValueError, KeyError, IndexError):
+                print("Could not extract a receipt ID.")
+
+            # The same details in the text format
+            expense_text = await get_expense.fn(expense_id=first_expense_id, format="text")
+            print("Text result:\n", expense_text)
 
         except Exception as e:
             print(f"Error during get_expense test: {e}")
@@ -89,8 +94,16 @@ async def main():
         else:
             print("\n[Test 5: Skipped] No receipt ID found to get a specific receipt.")
 
+        # Test 6: Get details for all receipts in one request
+        print(f"\n[Test 6: Getting all receipt details for expense {first_expense_id}...]")
+        try:
+            all_receipts = await get_all_expense_receipts_detailed.fn(expense_id=first_expense_id)
+            print("Result:\n", all_receipts)
+        except Exception as e:
+            print(f"Error during get_all_expense_receipts_detailed test: {e}")
+
     else:
-        print("\n[Tests 2-5: Skipped] No expense ID available to proceed with detailed tests.")
+        print("\n[Tests 2-6: Skipped] No expense ID available to proceed with detailed tests.")
 
     print("\n--- Tests Finished ---")
 